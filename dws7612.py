@@ -72,107 +72,288 @@ import os
 import sys
 import serial
 import signal
+import termios
+import struct
 import pymysql
 import logging
 import argparse
 import threading
-import subprocess
 import configparser
 
-from time import sleep, time_ns
+from time import time_ns, monotonic
+from decimal import Decimal, ROUND_HALF_UP
 import paho.mqtt.client as mqtt_client
+from dataclasses import dataclass, field
+from serial.tools import list_ports
 from logging.handlers import RotatingFileHandler
 
+############################### constants ###############################
+
+# Obis IDs
+_OID_180 = b'\x07\x01\x00\x01\x08\x00\xff' #Positive Active Energy
+_OID_280 = b'\x07\x01\x00\x02\x08\x00\xff' #Negative Active Energy
+_OID_PREFIX = _OID_180[:3]
+_OID_SUFFIX = _OID_180[4:]
+
+# MQTT topics
+_TOPIC_180 = 'meter/power/1.8.0'
+_TOPIC_280 = 'meter/power/2.8.0'
+
+# SML telegrams: upper bound of the meter's push interval (the DWS7612.2
+# sends about once per second) and transfer time of one telegram
+# (~400 bytes at 9600 baud), both in seconds
+_SML_INTERVAL = 2.0
+_SML_TRANSFER = 0.5
+
+# resolution of the published and stored readings (1 Wh)
+_KWH = Decimal('0.001')
+
+# struct formats of the SML integer sizes
+_INT_FMT  = {1: '>b', 2: '>h', 4: '>i', 8: '>q'}
+_UINT_FMT = {1: '>B', 2: '>H', 4: '>I', 8: '>Q'}
+
 ########################### class definitions ###########################
 
 class SimpleDWS7612Logger(threading.Thread):
-  # Obis IDs
-  _OID_180 = b'\x07\x01\x00\x01\x08\x00\xff' #Positive Active Energy
-  _OID_280 = b'\x07\x01\x00\x02\x08\x00\xff' #Negative Active Energy
+  # SQL statement for storing the meter readings
+  _SQL_INSERT = "INSERT INTO `data` (`channel_id`, `timestamp`, `value`) VALUES (%s, %s, %s)"
 
-  def __init__(self, port, cycle, hostname='', username='', password='', database='', logger=None):
+  def __init__(self, port, cycle, hostname='', username='', password='', database='', logger=None, mqttc=None):
     threading.Thread.__init__(self)
 
     # logger
     self._logger = logger
 
-    # counters
-    self._positive = 0.0
-    self._negative = 0.0
+    # mqtt client
+    self._mqttc = mqttc
+
+    # counters (raw meter values in 0.1 Wh)
+    self._positive = 0
+    self._negative = 0
 
-    # USB port
+    # USB port (kept open across read cycles)
     self._port = port
+    self._ser = None
+
+    # receive buffer (reused for every read)
+    self._rx = bytearray()
 
     # read cycle
     self._cycle = cycle
 
 
-    self._mysql = False
     # mysql parameters
     self._hostname = hostname
     self._username = username
     self._password = password
     self._database = database
 
-    if len(self._hostname) and \
-       len(self._username) and \
-       len(self._password) and \
-       len(self._database):
-      self._mysql = True
+    # logging requires all of the parameters
+    self._mysql = all((hostname, username, password, database))
+
+    # persistent mysql connection
+    self._conn = None
 
     # diverse
-    self._running = False
-    self._run = True
+    self._ready = threading.Event()
+    self._stop_evt = threading.Event()
 
   # public functions
   def get_positive(self):
-    return self._positive
+    # wait until the meter has been read at least once
+    self._ready.wait(10)
+    return float(self._to_kwh(self._positive))
 
   def get_negative(self):
-    return self._negative
+    # wait until the meter has been read at least once
+    self._ready.wait(10)
+    return float(self._to_kwh(self._negative))
 
   def stop(self):
-    self._run = False
+    self._stop_evt.set()
+
+  def is_stopped(self):
+    return self._stop_evt.is_set()
 
   # non-public functions
+  def _get_connection(self):
+    # (re)connect only if there is no open connection, otherwise
+    # make sure the connection survived the server's wait_timeout
+    if self._conn == None or not self._conn.open:
+      self._conn = pymysql.connect(host=self._hostname,
+                                   user=self._username,
+                                   password=self._password,
+                                   database=self._database,
+                                   autocommit=False)
+    else:
+      self._conn.ping(reconnect=True)
+    return self._conn
+
+  def _close_connection(self):
+    if self._conn != None:
+      try:
+        self._conn.close()
+      except Exception:
+        pass
+      self._conn = None
+
+  def _close_serial(self):
+    if self._ser != None:
+      try:
+        self._ser.close()
+      except Exception:
+        pass
+      self._ser = None
+
   def _log_data(self):
     if self._mysql:
+      conn = None
       try:
-        conn = pymysql.connect(host=self._hostname,
-                               user=self._username,
-                               password=self._password,
-                               database=self._database,
-                               cursorclass=pymysql.cursors.DictCursor)
-
-        with conn:
-          with conn.cursor() as cursor:
-            ts = int(time_ns()/1000000)
-            sql = "INSERT INTO `data` (`channel_id`, `timestamp`, `value`) VALUES (%s, %s, %s)"
-            cursor.execute(sql, ('29', str(ts), self._positive))
-            sql = "INSERT INTO `data` (`channel_id`, `timestamp`, `value`) VALUES (%s, %s, %s)"
-            cursor.execute(sql, ('30', str(ts), self._negative))
-            conn.commit()
+        conn = self._get_connection()
+        with conn.cursor() as cursor:
+          ts = time_ns() // 1000000
+          cursor.executemany(self._SQL_INSERT, [(29, ts, self._to_kwh(self._positive)),
+                                                (30, ts, self._to_kwh(self._negative))])
+          conn.commit()
       except pymysql.Error as e:
-        self._logger.error('MySQL Error: %s\n' % e)
+        self._logger.error('MySQL Error: %s\n', e)
+        if conn != None and conn.open:
+          # the statements failed on an open connection, discard the
+          # transaction and reconnect only if that fails too
+          try:
+            conn.rollback()
+          except pymysql.Error:
+            self._close_connection()
+        else:
+          # connecting failed, there is no transaction to discard
+          self._close_connection()
       except Exception as e:
-        self._logger.error('%s: %s' % (type(e), str(e.args)))
-
-  def _get_int(self, buffer, offset):
+        self._logger.error('%s: %s', type(e), e.args)
+        self._close_connection()
+
+  def _publish_data(self):
+    if self._mqttc != None:
+      r = self._mqttc.publish(_TOPIC_180, str(self._to_kwh(self._positive)))
+      self._logger.debug('Bezug:       %s - %s', r[0], r[1])
+      r = self._mqttc.publish(_TOPIC_280, str(self._to_kwh(self._negative)))
+      self._logger.debug('Einspeisung: %s - %s\n', r[0], r[1])
+
+  @staticmethod
+  def _unpack_int(buffer, offset, length, signed):
+    # sizes with a struct format are decoded without slicing, odd sizes
+    # fall back to int.from_bytes on a zero-copy memoryview
+    fmt = (_INT_FMT if signed else _UINT_FMT).get(length)
+    if fmt != None:
+      return struct.unpack_from(fmt, buffer, offset)[0]
+    tmp = memoryview(buffer)[offset:offset+length]
+    return int.from_bytes(tmp, byteorder='big', signed=signed)
+
+  @staticmethod
+  def _get_int(buffer, offset):
     result = None
     if (len(buffer)-offset) < 2:
       pass
     elif (buffer[offset] & 0xF0) == 0x50: # signed integer
       size = (buffer[offset] & 0x0F) # size including the 1-byte tag
       if (len(buffer)-offset) >= size:
-        tmp = buffer[offset+1:offset+size]
-        result = int.from_bytes(tmp, byteorder='big', signed=True)
+        result = SimpleDWS7612Logger._unpack_int(buffer, offset+1, size-1, True)
     elif (buffer[offset] & 0xF0) == 0x60: # unsigned integer
       size = (buffer[offset] & 0x0F) # size including the 1-byte tag
       if (len(buffer)-offset) >= size:
-        tmp = buffer[offset+1:offset+size]
-        result = int.from_bytes(tmp, byteorder='big', signed=False)
+        result = SimpleDWS7612Logger._unpack_int(buffer, offset+1, size-1, False)
     return result
 
+  @staticmethod
+  def _get_value(buffer, offset):
+    value = SimpleDWS7612Logger._get_int(buffer, offset)
+    if value == None:
+      value = 0
+    return value
+
+  @staticmethod
+  def _skip_element(buffer, offset):
+    # returns the offset behind the SML element starting at offset;
+    # nested lists are walked iteratively by counting the elements still
+    # to be skipped, so corrupted frames cannot exhaust the stack
+    pending = 1
+    while pending > 0:
+      tl = buffer[offset]
+      size = 1 # size of the type-length field
+      length = tl & 0x0F
+      while buffer[offset+size-1] & 0x80: # more type-length bytes
+        length = (length << 4) | (buffer[offset+size] & 0x0F)
+        size += 1
+      pending -= 1
+
+      if (tl & 0x70) == 0x70: # list, length is the number of elements
+        offset += size
+        pending += length
+      else:
+        # end of message (0x00) has no length
+        offset += max(length, 1)
+    return offset
+
+  @staticmethod
+  def _get_entry_value(buffer, offset):
+    # skip objName, status, valTime, unit and scaler of the list entry
+    try:
+      for i in range(5):
+        offset = SimpleDWS7612Logger._skip_element(buffer, offset)
+    except IndexError:
+      return None
+    return SimpleDWS7612Logger._get_value(buffer, offset)
+
+  @staticmethod
+  def _to_kwh(value):
+    # raw meter value (0.1 Wh) to kWh, rounded half up to whole Wh
+    return Decimal(value).scaleb(-4).quantize(_KWH, rounding=ROUND_HALF_UP)
+
+  @staticmethod
+  def _decode(msg):
+    positive = 0
+    negative = 0
+
+    # both OIDs only differ in their 4th byte, so a single scan for the
+    # common prefix finds both; the raw values (0.1 Wh) are returned
+    offset = msg.find(_OID_PREFIX)
+    while offset >= 0:
+      obis = msg[offset+3] if msg.startswith(_OID_SUFFIX, offset+4) else None
+      if obis == _OID_180[3] or obis == _OID_280[3]:
+        value = SimpleDWS7612Logger._get_entry_value(msg, offset)
+        if value != None:
+          if obis == _OID_180[3]:
+            # positive active energy (1.8.0)
+            positive = value
+          else:
+            # negative active energy (2.8.0)
+            negative = value
+      offset = msg.find(_OID_PREFIX, offset+1)
+
+    return positive, negative
+
+  def _read_chunk(self, ser, data, timeout):
+    # append all bytes received so far with one read; only reads what is
+    # waiting, so it never blocks, and stop() interrupts waiting for data
+    while monotonic() < timeout:
+      n = ser.in_waiting
+      if n > 0:
+        data.extend(ser.read(n))
+        return True
+      if self._stop_evt.wait(0.05):
+        break
+    return False
+
+  def _read_until(self, ser, data, stop_seq, timeout):
+    # unlike ser.read_until(), which reads byte by byte, read in chunks
+    stop_idx = data.find(stop_seq)
+    while stop_idx < 0:
+      # the stop sequence may span two chunks
+      start = max(0, len(data) - len(stop_seq) + 1)
+      if not self._read_chunk(ser, data, timeout):
+        break
+      stop_idx = data.find(stop_seq, start)
+    return stop_idx
+
   def _read_sml_message(self, ser):
     self._logger.info('Reading SML message...')
 
@@ -180,109 +361,112 @@ class SimpleDWS7612Logger(threading.Thread):
     stop_seq  = b'\x1b\x1b\x1b\x1b\x1a'
 
     msg = b''
-    data = b''
+    data = self._rx
+    del data[:]
+    # the input buffer has just been reset, so the worst case is the rest
+    # of a partial telegram, the gap to the next one and its transfer;
+    # allow two push intervals plus one transfer time, even if (garbage)
+    # data keeps coming in
+    timeout = monotonic() + 2 * _SML_INTERVAL + _SML_TRANSFER
 
     while True:
       # try reading until stop sequence
-      data = ser.read_until(stop_seq)
+      stop_idx = self._read_until(ser, data, stop_seq, timeout)
 
       # reading failed, when there is no stop sequence
-      stop_idx = data.find(stop_seq)
       if stop_idx < 0:
         break
 
-      # read 3 more bytes (filler and crc)
-      data += ser.read(3)
+      # read the rest of the 3 more bytes (filler and crc)
+      end_idx = stop_idx + len(stop_seq) + 3
+      while len(data) < end_idx:
+        if not self._read_chunk(ser, data, timeout):
+          break
 
-      # do again, if there is no start sequence
-      start_idx = data.find(start_seq)
-      if start_idx < 0:
-        continue
+      # a frame without its filler and crc is a failed read
+      if len(data) < end_idx:
+        break
 
-      # stop sequence must be after start sequence
-      if stop_idx > start_idx:
-        msg = data[start_idx :(stop_idx + len(stop_seq) + 3)]
+      # start sequence must be in front of the stop sequence
+      start_idx = data.find(start_seq, 0, stop_idx)
+      if start_idx >= 0:
+        msg = bytes(data[start_idx:end_idx])
         break
 
+      # do again with the bytes behind this incomplete frame
+      del data[:end_idx]
+
     return msg
 
   def run(self):
-    while self._run:
-      telegram = b''
-      data = b''
-
-      try:
-        ser = serial.Serial(self._port, 9600, timeout=3)
-        msg = self._read_sml_message(ser)
-        ser.close()
-
-        if len(msg) and self._run:
-          self._logger.info('Message length: %d' % len(msg))
-
-          # decode positive active energy (1.8.0)
-          offset = msg.find(self._OID_180)
-          self._positive = 0.0
-          if offset > 0:
-            value = self._get_int(msg, offset+20)
-            if value == None:
-              value = 0
-            self._positive = round((value/10000),3)
-          self._logger.info('1.8.0: %s kWh' % str('%.3f' % (self._positive)).rjust(10))
-
-          # decode negative active energy (2.8.0)
-          offset = msg.find(self._OID_280)
-          self._negative = 0.0
-          if offset > 0:
-            value = self._get_int(msg, offset+17)
-            if value == None:
-              value = 0
-            self._negative = round((value/10000),3)
-          self._logger.info('2.8.0: %s kWh' % str('%.3f' % (self._negative)).rjust(10))
-
-          # log the meter readings
-          self._log_data()
-        else:
-          if self._run:
-            self._logger.error('Error: reading serial port (%s)\n' % (self._port))
-      except serial.SerialException as e:
-        self._logger.error('Error: ' + str(e))
-        if self._run == False:
+    try:
+      while not self._stop_evt.is_set():
+        # start of the next cycle, independent of the time spent reading
+        deadline = monotonic() + self._cycle
+
+        try:
+          if self._ser == None:
+            self._ser = serial.Serial(self._port, 9600, timeout=3)
+          else:
+            # discard the telegrams buffered since the last cycle
+            self._ser.reset_input_buffer()
+          msg = self._read_sml_message(self._ser)
+
+          if len(msg) and not self._stop_evt.is_set():
+            self._logger.info('Message length: %d', len(msg))
+
+            # decode positive (1.8.0) and negative (2.8.0) active energy
+            self._positive, self._negative = self._decode(msg)
+            self._logger.info('1.8.0: %10s kWh', self._to_kwh(self._positive))
+            self._logger.info('2.8.0: %10s kWh', self._to_kwh(self._negative))
+
+            # log and publish the meter readings
+            self._log_data()
+            self._publish_data()
+          else:
+            if not self._stop_evt.is_set():
+              self._logger.error('Error: reading serial port (%s)\n', self._port)
+        except (serial.SerialException, OSError, termios.error) as e:
+          # pyserial does not wrap all I/O errors of an open port, e.g.
+          # after the adapter has been unplugged
+          self._logger.error('Error: %s', e)
+          # reopen the port with the next attempt
+          self._close_serial()
+          if self._stop_evt.wait(2):
+            break
+          continue
+
+        # stop() has been call, so let's exit the thread
+        if self._stop_evt.is_set():
           break
-        sleep(2)
-        continue
 
-      # stop() has been call, so let's exit the thread
-      if self._run == False:
-        break
+        # signal that the meter has at least been read once
+        self._ready.set()
 
-      # ensure the meter has at least been read once
-      if self._running == False:
-        self._running = True
-
-      # sleep loop
-      i = self._cycle * 100
-      while i > 0:
-        if self._run == False:
+        # wait for the next cycle, stop() interrupts immediately
+        if self._stop_evt.wait(max(0, deadline - monotonic())):
           break
-        i -=1
-        sleep(0.01)
+    finally:
+      self._close_serial()
+      self._close_connection()
 
-class cfg:
+@dataclass(frozen=True)
+class Cfg:
   #section [General]
-  cycle=''          # read cycle in seconds - default: 60
+  cycle: int = 60           # read cycle in seconds - default: 60
   #section [Meter]
-  dport=''          # device port - default: /dev/ttyUSB0
-  dname=''          # device name
+  dport: str = '/dev/ttyUSB0' # device port - default: /dev/ttyUSB0
+  dname: str = ''           # device name
   #section [MySQL]
-  mysql_host=''     # host name or ip address
-  mysql_user=''     # user name
-  mysql_pwd=''      # user password
-  mysql_db=''       # database name
+  mysql_host: str = ''      # host name or ip address
+  mysql_user: str = ''      # user name
+  mysql_pwd: str = field(default='', repr=False) # user password
+  mysql_db: str = ''        # database name
   #section [MQTT]
-  mqtt_broker=''    # broker ip
-  mqtt_port=''      # broker port
-  mqtt_user=''      # username
-  mqtt_pwd=''       # passwort
+  mqtt_broker: str = ''     # broker ip
+  mqtt_port: int = 1883     # broker port
+  mqtt_user: str = ''       # username
+  mqtt_pwd: str = field(default='', repr=False)  # passwort
 
 class bcolors:
     HEADER = '\033[95m'
@@ -298,10 +482,10 @@ class bcolors:
 ########################### global functions ############################
 
 def assert_python3():
-  """ Assert that at least Python 3.5 is used
+  """ Assert that at least Python 3.7 is used
   """
   assert(sys.version_info.major == 3)
-  assert(sys.version_info.minor >= 5)
+  assert(sys.version_info.minor >= 7)
 
 def signalHandler(num, frame):
   if(num == signal.SIGINT):
@@ -312,65 +496,69 @@ def signalHandler(num, frame):
 
 def read_cfg(nosql=False):
   cfg_file = os.path.dirname(os.path.abspath(__file__)) + '/dws7612.cfg'
-  logger.info('Config:  %s\n' %  cfg_file)
+  logger.info('Config:  %s\n', cfg_file)
   parser = configparser.ConfigParser()
   parser.read(cfg_file)
 
-  global cfg
-  cfg.cycle = parser.getint('General', 'cycle', fallback=60)
-  if cfg.cycle < 2:
-    cfg.cycle = 30
+  cycle = parser.getint('General', 'cycle', fallback=60)
+  if cycle < 2:
+    cycle = 30
 
-  cfg.dport = parser.get('Meter', 'port', fallback='/dev/ttyUSB0')
-  cfg.dname = parser.get('Meter', 'name', fallback='')
+  dport = parser.get('Meter', 'port', fallback='') or Cfg.dport
+  dname = parser.get('Meter', 'name', fallback='')
+  if len(dname):
+    port = get_port(dname)
+    if len(port):
+      dport = port
+    else:
+      logger.error('Device not found: %s, using port %s', dname, dport)
 
+  # leaving the mysql parameters empty disables database logging
+  mysql = {}
   if nosql == False:
-    cfg.mysql_host = parser.get('MySQL', 'hostname', fallback='')
-    cfg.mysql_user = parser.get('MySQL', 'username', fallback='')
-    cfg.mysql_pwd = parser.get('MySQL', 'password', fallback='')
-    cfg.mysql_db = parser.get('MySQL', 'database', fallback='')
-
-    if len(cfg.mysql_host) and \
-       len(cfg.mysql_user) and \
-       len(cfg.mysql_pwd) and \
-       len(cfg.mysql_db):
-       global mysql_logging
-       mysql_logging = True;
-
-  cfg.mqtt_broker = parser.get('MQTT', 'broker', fallback='')
-  cfg.mqtt_port = parser.getint('MQTT', 'port', fallback=1883)
-  cfg.mqtt_user = parser.get('MQTT', 'user', fallback='')
-  cfg.mqtt_pwd = parser.get('MQTT', 'pwd', fallback='')
+    mysql = dict(mysql_host=parser.get('MySQL', 'hostname', fallback=''),
+                 mysql_user=parser.get('MySQL', 'username', fallback=''),
+                 mysql_pwd=parser.get('MySQL', 'password', fallback=''),
+                 mysql_db=parser.get('MySQL', 'database', fallback=''))
+
+  return Cfg(cycle=cycle,
+             dport=dport,
+             dname=dname,
+             mqtt_broker=parser.get('MQTT', 'broker', fallback=''),
+             mqtt_port=parser.getint('MQTT', 'port', fallback=1883),
+             mqtt_user=parser.get('MQTT', 'user', fallback=''),
+             mqtt_pwd=parser.get('MQTT', 'pwd', fallback=''),
+             **mysql)
 
 def get_port(device_name):
-  port = ''
-  command = 'dmesg | grep -i "' + device_name + '"'
-
-  try:
-    result = subprocess.check_output(command, shell=True, text=True)
-    x = result.find('tty')
-    if x:
-      port='/dev/' + result[x:]
-      x = port.find(' ')
-      if x:
-        port = port[:x]
-  except Exception as e:
-    logger.error(f'{type(e)}: {str(e.args)}')
-
-  return port
-
-def connect_mqtt():
+  name = device_name.lower()
+  for p in list_ports.comports():
+    # match the USB description strings
+    for attr in (p.description, p.product, p.manufacturer, p.interface):
+      if attr and name in attr.lower():
+        return p.device
+
+    # match the kernel driver, e.g. 'cp210x' for both 'cp210x' and the
+    # kernel's log text 'cp210x converter'
+    device_path = getattr(p, 'device_path', None)
+    if device_path and os.path.islink(device_path + '/driver'):
+      driver = os.path.basename(os.path.realpath(device_path + '/driver')).lower()
+      if name in driver or driver in name:
+        return p.device
+
+  return ''
+
+def connect_mqtt(cfg):
   def on_connect(client, userdata, flags, reason_code, properties):
     if reason_code.is_failure:
       logger.error("Failed to connect, return code %d\n", reason_code)
     else:
-      global mqtt_connected
-      mqtt_connected = True
+      mqtt_connected.set()
 
   client = mqtt_client.Client(mqtt_client.CallbackAPIVersion.VERSION2)
   client.username_pw_set(cfg.mqtt_user, cfg.mqtt_pwd)
   client.on_connect = on_connect
-  client.connect(cfg.mqtt_broker, cfg.mqtt_port)
+  client.connect_async(cfg.mqtt_broker, cfg.mqtt_port)
   return client
 
 ########################### global variables ############################
@@ -380,8 +568,7 @@ mqttc = None
 args = None
 dws = None
 
-mysql_logging = False
-mqtt_connected = False
+mqtt_connected = threading.Event()
 
 ################################# main ##################################
 
@@ -432,47 +619,37 @@ def main():
   sh.setFormatter(formatter)
   logger.addHandler(sh)
 
-  read_cfg(args.nosql)
-  if len(cfg.dname):
-    cfg.dport = get_port(cfg.dname)
+  cfg = read_cfg(args.nosql)
 
-  logger.info('Device:  ' + cfg.dport)
-  logger.info('Cycle:   ' + str(cfg.cycle))
+  logger.info('Device:  %s', cfg.dport)
+  logger.info('Cycle:   %d', cfg.cycle)
   if args.nosql:
     logger.info(f'Logging: {bcolors.WARNING}disabled{bcolors.ENDC}\n')
   else:
     logger.info(f'Logging: {bcolors.OKGREEN}enabled{bcolors.ENDC}\n')
 
-  logger.info(f'Connecting to MQTT-Broker ({cfg.mqtt_broker})...')
+  logger.info('Connecting to MQTT-Broker (%s)...', cfg.mqtt_broker)
   global mqttc
-  mqttc = connect_mqtt()
+  mqttc = connect_mqtt(cfg)
   mqttc.loop_start()
-  for i in range(100):
-    if mqtt_connected:
-      break
-    sleep(0.1)
-  if mqtt_connected:
-    logger.info(f"{bcolors.OKGREEN}success{bcolors.ENDC}.\n")
-  else:
-    logger.info(f"{bcolors.FAIL}failed{bcolors.ENDC}.\n")
 
+  # start reading the meter while the broker connection is established
   global dws
-  if mysql_logging:
-    dws = SimpleDWS7612Logger(cfg.dport, cfg.cycle, cfg.mysql_host, cfg.mysql_user, cfg.mysql_pwd, cfg.mysql_db, logger)
-  else:
-    dws = SimpleDWS7612Logger(cfg.dport, cfg.cycle, logger)
+  dws = SimpleDWS7612Logger(cfg.dport, cfg.cycle, cfg.mysql_host, cfg.mysql_user, cfg.mysql_pwd, cfg.mysql_db, logger, mqttc)
   dws.start()
-  sleep(2)
 
-  while True:
-    r = mqttc.publish('meter/power/1.8.0', str(dws.get_positive()))
-    logger.debug(f'Bezug:       {str(r[0])} - {str(r[1])}')
-    r = mqttc.publish('meter/power/2.8.0', str(dws.get_negative()))
-    logger.debug(f'Einspeisung: {str(r[0])} - {str(r[1])}\n')
-    sleep(cfg.cycle + 1)
+  if mqtt_connected.wait(10.0):
+    logger.info(f"{bcolors.OKGREEN}success{bcolors.ENDC}.\n")
+  else:
+    logger.info(f"{bcolors.FAIL}failed{bcolors.ENDC}.\n")
+
+  # the logger thread publishes each reading right after it has been read
+  dws.join()
 
-  mqttc.loop_stop()
-  mqttc.disconnect()
+  # the thread must only end after stop(), otherwise let systemd restart us
+  if not dws.is_stopped():
+    logger.error('SimpleDWS7612Logger terminated unexpectedly.')
+    sys.exit(1)
 
 if __name__ == '__main__':
   try: